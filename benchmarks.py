@@ -0,0 +1,116 @@
+import sys
+import tracemalloc
+from datetime import datetime
+from time import perf_counter
+
+from vtypes import (
+    Validator,
+    VString,
+    VInt,
+    VBool,
+    VList,
+    VDateTime,
+)
+
+
+validator = Validator(
+    myint=VInt(),
+    mystring=VString(),
+    mybool=VBool(),
+    mydatetime=VDateTime(),
+    mylist=VList(of=VInt()),
+)
+
+
+def make_params(count):
+    return [
+        dict(myint=str(i), mystring='string', mybool='false',
+             mydatetime='2016-10-22T10:30:{:02d}'.format(i % 60),
+             mylist=[str(i), '2', '3'])
+        for i in range(count)]
+
+
+def timed(func, *args, **kwargs):
+    start = perf_counter()
+    func(*args, **kwargs)
+    return perf_counter() - start
+
+
+def bench_threads(count=50000):
+    params = make_params(count)
+    gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('to_types_many, {} records, GIL {}'.format(
+        count, 'enabled' if gil_enabled else 'disabled'))
+    serial = timed(validator.to_types_many, params)
+    print('  serial: {:.3f}s'.format(serial))
+    for workers in (1, 2, 4, 8):
+        taken = timed(validator.to_types_many, params, executor='threads', workers=workers)
+        print('  threads={}: {:.3f}s ({:.2f}x)'.format(workers, taken, serial / taken))
+
+
+def bench_sampled(count=50000):
+    params = make_params(count)
+    print('to_types, {} records'.format(count))
+    full = timed(lambda: [validator.to_types(p) for p in params])
+    print('  full: {:.3f}s'.format(full))
+    for rate in (0.1, 0.01, 0):
+        sampled = validator.sampled(rate=rate, seed=0)
+        taken = timed(lambda: [sampled.to_types(p) for p in params])
+        print('  sampled rate={}: {:.3f}s ({:.2f}x)'.format(rate, taken, full / taken))
+
+
+def allocations(func, params_list):
+    # Net number of memory blocks allocated while processing each
+    # record, averaged over the records. The result is kept alive
+    # until the second snapshot so that it is counted, and blocks
+    # allocated by tracemalloc itself are ignored.
+    tracemalloc.start()
+    total = 0
+    for params in params_list:
+        before = tracemalloc.take_snapshot()
+        result = func(params)
+        after = tracemalloc.take_snapshot()
+        total += sum(stat.count_diff for stat in after.compare_to(before, 'filename')
+                     if stat.count_diff > 0 and stat.traceback[0].filename != tracemalloc.__file__)
+        del result
+    tracemalloc.stop()
+    return total / len(params_list)
+
+
+def bench_into(count=500):
+    params = make_params(count)
+    out = {}
+    print('to_types vs to_types_into, {} records'.format(count))
+    print('  to_types: {:.1f} allocations/record'.format(
+        allocations(validator.to_types, params)))
+    print('  to_types_into: {:.1f} allocations/record'.format(
+        allocations(lambda p: validator.to_types_into(p, out), params)))
+
+
+def bench_datetime(count=50000):
+    values = ['2016-10-22T10:30:{:02d}.{:06d}+02:00'.format(i % 60, i) for i in range(count)]
+    naive = Validator(mydatetime=VDateTime())
+    aware = Validator(mydatetime=VDateTime(tz_aware=True))
+    print('VDateTime, {} values'.format(count))
+    taken = timed(lambda: [naive.to_types(dict(mydatetime=v[:-6])) for v in values])
+    print('  naive: {:.3f}s'.format(taken))
+    taken = timed(lambda: [
+        dict(mydatetime=datetime.strptime(v, '%Y-%m-%dT%H:%M:%S.%f%z'))
+        for v in values])
+    print('  strptime with %z: {:.3f}s'.format(taken))
+    taken = timed(lambda: [aware.to_types(dict(mydatetime=v)) for v in values])
+    print('  tz_aware: {:.3f}s'.format(taken))
+
+
+BENCHMARKS = {
+    'threads': bench_threads,
+    'sampled': bench_sampled,
+    'into': bench_into,
+    'datetime': bench_datetime,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -1,10 +1,19 @@
+import os
+import re
+
 from setuptools import setup
 
 
+def read_version():
+    path = os.path.join(os.path.dirname(__file__), 'vtypes', '__init__.py')
+    with open(path) as f:
+        return re.search(r"^__version__ = '([^']+)'", f.read(), re.M).group(1)
+
+
 setup(
     name='vtypes',
     packages=['vtypes'],
-    version='0.0.1',
+    version=read_version(),
     author='Andrew Plummer',
     author_email='plummer574@gmail.com',
     url='https://github.com/plumdog/vtypes',
@@ -1,6 +1,15 @@
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import OrderedDict
+from copy import copy, deepcopy
 from unittest import TestCase
-from datetime import date, datetime, time
+from datetime import date, datetime, time, timedelta, timezone
 from enum import Enum
+from types import MappingProxyType
 
 from vtypes import (
     Validator,
@@ -17,6 +26,7 @@ from vtypes import (
     VTime,
     VEnum,
 )
+from vtypes.io import read_csv, write_csv
 
 
 class _VTypeBase(object):
@@ -407,6 +417,102 @@ class VDateTimeTestCase(_VTypeBase, TestCase):
     ]
 
 
+plus2 = timezone(timedelta(hours=2))
+minus530 = timezone(-timedelta(hours=5, minutes=30))
+
+
+class VDateTimeTzAwareTestCase(_VTypeBase, TestCase):
+
+    vtype = VDateTime
+    vtype_kwargs = dict(tz_aware=True)
+    vkey = 'mydatetime'
+
+    ok_to_strings = [
+        (dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2)),
+         dict(mydatetime='2016-10-22T10:30:03+02:00')),
+        (dict(mydatetime='2016-10-22T10:30:03+02:00'),
+         dict(mydatetime='2016-10-22T10:30:03+02:00')),
+        (dict(mydatetime='2016-10-22T10:30:03Z'),
+         dict(mydatetime='2016-10-22T10:30:03+00:00')),
+    ]
+    ok_to_types = [
+        (dict(mydatetime='2016-10-22T10:30:03+02:00'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2))),
+        (dict(mydatetime='2016-10-22T10:30:03+0200'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2))),
+        (dict(mydatetime='2016-10-22T10:30:03.12-05:30'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, 120000, tzinfo=minus530))),
+        (dict(mydatetime='2016-10-22T10:30:03.123456+02:00'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, 123456, tzinfo=plus2))),
+        (dict(mydatetime='2016-1-2T10:30:03+02:00'),
+         dict(mydatetime=datetime(2016, 1, 2, 10, 30, 3, tzinfo=plus2))),
+        (dict(mydatetime='2016-10-22T10:30:03Z'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=timezone.utc))),
+        (dict(mydatetime='2016-10-22T10:30:03.12Z'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, 120000, tzinfo=timezone.utc))),
+        (dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2)),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2))),
+    ]
+    bad_to_strings = [
+        dict(),
+        dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3)),
+        dict(mydatetime='2016-10-22T10:30:03'),
+        dict(mydatetime=None),
+    ]
+    bad_to_types = [
+        dict(),
+        dict(mydatetime='2016-10-22T10:30:03'),
+        dict(mydatetime='2016-10-22T10:30:03+24:00'),
+        dict(mydatetime='2016-10-22T10:30:03+02:60'),
+        dict(mydatetime='2016-10-22T10:30:03+0a:00'),
+        dict(mydatetime='2016-10-22 10:30:03+02:00'),
+        dict(mydatetime='2016-10-22T10:30+02:00'),
+        dict(mydatetime='20161022T103003+02:00'),
+        dict(mydatetime='2016-10-22T10:30:03.1234567+02:00'),
+        dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3)),
+        dict(mydatetime=None),
+        dict(mydatetime='not-a-datetime'),
+    ]
+
+    def test_tzinfo_is_shared(self):
+        first = self.validator.to_types(dict(mydatetime='2016-10-22T10:30:03+02:00'))
+        second = self.validator.to_types(dict(mydatetime='2016-10-23T11:00:00+0200'))
+        self.assertIs(first['mydatetime'].tzinfo, second['mydatetime'].tzinfo)
+        utc = self.validator.to_types(dict(mydatetime='2016-10-22T10:30:03+00:00'))
+        self.assertIs(utc['mydatetime'].tzinfo, timezone.utc)
+
+
+class VDateTimeToUTCTestCase(_VTypeBase, TestCase):
+
+    vtype = VDateTime
+    vtype_kwargs = dict(tz_aware=True, to_utc=True)
+    vkey = 'mydatetime'
+
+    ok_to_strings = [
+        (dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2)),
+         dict(mydatetime='2016-10-22T08:30:03+00:00')),
+        (dict(mydatetime='2016-10-22T10:30:03.12-05:30'),
+         dict(mydatetime='2016-10-22T16:00:03.120000+00:00')),
+    ]
+    ok_to_types = [
+        (dict(mydatetime='2016-10-22T10:30:03+02:00'),
+         dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3, tzinfo=plus2))),
+    ]
+    bad_to_strings = [
+        dict(mydatetime=datetime(2016, 10, 22, 10, 30, 3)),
+    ]
+    bad_to_types = [
+        dict(mydatetime='2016-10-22T10:30:03'),
+    ]
+
+
+class VDateTimeOptionsTestCase(TestCase):
+
+    def test_to_utc_requires_tz_aware(self):
+        with self.assertRaises(ValueError):
+            VDateTime(to_utc=True)
+
+
 class VTimeTestCase(_VTypeBase, TestCase):
 
     vtype = VTime
@@ -518,3 +624,544 @@ class VNonStringEnumTestCase(_VTypeBase, TestCase):
         dict(myenum=''),
         dict(myenum=None),
     ]
+
+
+class CountingVInt(VInt):
+    calls = 0
+
+    def coerce_string_to_type(self, value):
+        CountingVInt.calls += 1
+        return super().coerce_string_to_type(value)
+
+
+class CachedValidatorTestCase(TestCase):
+
+    def setUp(self):
+        CountingVInt.calls = 0
+        self.validator = Validator(
+            myint=CountingVInt(),
+            mystring=VString(),
+        )
+
+    def test_hit_skips_coercion(self):
+        validator = self.validator.cached()
+        first = validator.to_types(dict(myint='1', mystring='a'))
+        second = validator.to_types(dict(mystring='a', myint='1'))
+        self.assertEqual(first, dict(myint=1, mystring='a'))
+        self.assertEqual(second, first)
+        self.assertEqual(CountingVInt.calls, 1)
+        self.assertEqual(validator.cache_info().hits, 1)
+        self.assertEqual(validator.cache_info().misses, 1)
+
+    def test_types_are_part_of_key(self):
+        validator = self.validator.cached()
+        validator.to_types(dict(myint='1', mystring='a'))
+        validator.to_types(dict(myint=1, mystring='a'))
+        self.assertEqual(validator.cache_info().misses, 2)
+
+    def test_errors_are_not_cached(self):
+        validator = self.validator.cached()
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                validator.to_types(dict(myint='one', mystring='a'))
+        self.assertEqual(validator.cache_info().currsize, 0)
+
+    def test_results_are_copies(self):
+        validator = self.validator.cached()
+        validator.to_types(dict(myint='1', mystring='a'))['myint'] = 2
+        self.assertEqual(validator.to_types(dict(myint='1', mystring='a')),
+                         dict(myint=1, mystring='a'))
+
+    def test_mutable_fields_are_deep_copied(self):
+        validator = Validator(mylist=VList(of=VInt())).cached()
+        validator.to_types(dict(mylist=['1']))['mylist'].append(2)
+        self.assertEqual(validator.to_types(dict(mylist=['1'])), dict(mylist=[1]))
+        validator.to_types(dict(mylist=['1']))['mylist'].append(2)
+        self.assertEqual(validator.to_types(dict(mylist=['1'])), dict(mylist=[1]))
+
+    def test_immutable(self):
+        validator = self.validator.cached(immutable=True)
+        for _ in range(2):
+            record = validator.to_types(dict(myint='1', mystring='a'))
+            self.assertIsInstance(record, MappingProxyType)
+            with self.assertRaises(TypeError):
+                record['myint'] = 2
+
+    def test_nested_immutable(self):
+        inner = Validator(myint=VInt()).cached(immutable=True)
+        validator = Validator(myvdict=VValidatorDict(validator=inner)).cached()
+        for _ in range(2):
+            record = validator.to_types(dict(myvdict=dict(myint='1')))
+            self.assertEqual(record, dict(myvdict=dict(myint=1)))
+            record['myvdict']['myint'] = 2
+        self.assertEqual(validator.cache_info().hits, 1)
+
+    def test_immutable_refused_for_mutable_fields(self):
+        with self.assertRaises(ValueError):
+            Validator(mydict=VDict()).cached(immutable=True)
+
+    def test_lru_eviction(self):
+        validator = self.validator.cached(maxsize=2)
+        validator.to_types(dict(myint='1', mystring='a'))
+        validator.to_types(dict(myint='2', mystring='a'))
+        validator.to_types(dict(myint='1', mystring='a'))
+        validator.to_types(dict(myint='3', mystring='a'))
+        self.assertEqual(validator.cache_info().currsize, 2)
+        validator.to_types(dict(myint='1', mystring='a'))
+        self.assertEqual(CountingVInt.calls, 3)
+        validator.to_types(dict(myint='2', mystring='a'))
+        self.assertEqual(CountingVInt.calls, 4)
+
+    def test_ttl(self):
+        now = [0]
+        validator = self.validator.cached(ttl=10)
+        validator._cache.clock = lambda: now[0]
+        validator.to_types(dict(myint='1', mystring='a'))
+        now[0] = 9
+        validator.to_types(dict(myint='1', mystring='a'))
+        self.assertEqual(CountingVInt.calls, 1)
+        now[0] = 10
+        validator.to_types(dict(myint='1', mystring='a'))
+        self.assertEqual(CountingVInt.calls, 2)
+
+    def test_unhashable_input_bypasses_cache(self):
+        validator = Validator(mydict=VDict()).cached()
+        self.assertEqual(validator.to_types(dict(mydict={1: 'a', 'b': 2})),
+                         dict(mydict={1: 'a', 'b': 2}))
+        self.assertEqual(validator.cache_info().currsize, 0)
+
+    def test_equal_values_are_not_a_hit(self):
+        validator = Validator(mydatetime=VDateTime(tz_aware=True)).cached()
+        utc = datetime(2016, 10, 22, 12, tzinfo=timezone.utc)
+        plus2 = datetime(2016, 10, 22, 14, tzinfo=timezone(timedelta(hours=2)))
+        self.assertEqual(validator.to_types(dict(mydatetime=utc))['mydatetime'].utcoffset(),
+                         timedelta(0))
+        self.assertEqual(validator.to_types(dict(mydatetime=plus2))['mydatetime'].utcoffset(),
+                         timedelta(hours=2))
+
+        validator = Validator(mydict=VDict()).cached()
+        validator.to_types(dict(mydict=dict(x=0.0)))
+        self.assertEqual(repr(validator.to_types(dict(mydict=dict(x=-0.0)))), repr(dict(mydict=dict(x=-0.0))))
+        self.assertEqual(validator.cache_info().misses, 2)
+
+    def test_unknown_values_bypass_cache(self):
+        validator = Validator(mydict=VDict()).cached()
+        validator.to_types(dict(mydict=dict(x=object())))
+        self.assertEqual(validator.cache_info().currsize, 0)
+
+    def test_dict_subclass_is_not_a_hit(self):
+        validator = Validator(mydict=VDict()).cached()
+        validator.to_types(dict(mydict=dict(a=1)))
+        with self.assertRaises(ValueError):
+            validator.to_types(dict(mydict=OrderedDict(a=1)))
+
+    def test_add_and_remove_stay_cached(self):
+        validator = self.validator.cached(maxsize=5).remove('mystring').add(other=VString())
+        self.assertEqual(validator.cache_info().maxsize, 5)
+
+    def test_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.validator.cache_info()
+
+
+class CSVTestCase(TestCase):
+
+    validator = Validator(
+        myint=VInt(),
+        mybool=VBool(),
+        mydate=VDate(required=False),
+    )
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'data.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, content):
+        with open(self.path, 'w', newline='') as f:
+            f.write(content)
+
+    def test_read(self):
+        self._write('myint,mybool,mydate\r\n1,false,2016-10-22\r\n2,1,\r\n')
+        self.assertEqual(list(read_csv(self.path, self.validator)), [
+            dict(myint=1, mybool=False, mydate=date(2016, 10, 22)),
+            dict(myint=2, mybool=True, mydate=None),
+        ])
+
+    def test_read_is_lazy(self):
+        self._write('myint,mybool,mydate\n1,1,\nbad,1,\n')
+        records = read_csv(self.path, self.validator)
+        self.assertEqual(next(records), dict(myint=1, mybool=True, mydate=None))
+        with self.assertRaises(ValueError):
+            next(records)
+
+    def test_read_columns(self):
+        self._write('myint,mybool,mydate\n1,1,not-a-date\n')
+        self.assertEqual(list(read_csv(self.path, self.validator, columns=['myint'])),
+                         [dict(myint=1)])
+
+    def test_read_columns_iterator(self):
+        self._write('myint,mybool,mydate\n1,1,\n')
+        columns = (column for column in ['myint'])
+        self.assertEqual(list(read_csv(self.path, self.validator, columns=columns)),
+                         [dict(myint=1)])
+
+    def test_read_columns_not_in_header(self):
+        self._write('myint,mybool\n1,1\n')
+        with self.assertRaises(ValueError):
+            list(read_csv(self.path, self.validator, columns=['mydate']))
+
+    def test_read_rename(self):
+        self._write('ID,Flag,Date\n1,1,\n')
+        rename = {'ID': 'myint', 'Flag': 'mybool', 'Date': 'mydate'}
+        self.assertEqual(list(read_csv(self.path, self.validator, rename=rename)),
+                         [dict(myint=1, mybool=True, mydate=None)])
+
+    def test_read_batches(self):
+        self._write('myint,mybool,mydate\n' + ''.join('{},1,\n'.format(i) for i in range(5)))
+        batches = list(read_csv(self.path, self.validator, batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[2][0]['myint'], 4)
+
+    def test_read_tsv(self):
+        self._write('myint\tmybool\tmydate\n1\t1\t\n')
+        self.assertEqual(list(read_csv(self.path, self.validator, delimiter='\t')),
+                         [dict(myint=1, mybool=True, mydate=None)])
+
+    def test_read_wrong_field_count(self):
+        self._write('myint,mybool,mydate\n1,1\n')
+        with self.assertRaises(ValueError):
+            list(read_csv(self.path, self.validator))
+
+    def test_read_empty(self):
+        self._write('')
+        self.assertEqual(list(read_csv(self.path, self.validator)), [])
+
+    def test_round_trip(self):
+        records = [
+            dict(myint=1, mybool=False, mydate=date(2016, 10, 22)),
+            dict(myint=2, mybool=True, mydate=None),
+        ]
+        self.assertEqual(write_csv(self.path, self.validator, records, batch_size=1), 2)
+        self.assertEqual(list(read_csv(self.path, self.validator)), records)
+
+
+class ImmutableTestCase(TestCase):
+
+    def test_validator_is_immutable(self):
+        validator = Validator(myint=VInt())
+        with self.assertRaises(AttributeError):
+            validator.vs = {}
+        with self.assertRaises(TypeError):
+            validator.vs['other'] = VInt()
+
+    def test_vtype_is_immutable_in_validator(self):
+        vtype = VInt()
+        vtype.required = False
+        Validator(myint=vtype)
+        with self.assertRaises(AttributeError):
+            vtype.required = True
+
+    def test_nested_vtype_is_immutable(self):
+        of = VInt()
+        Validator(mylist=VList(of=of))
+        with self.assertRaises(AttributeError):
+            of.required = False
+
+    def test_vtype_copies_are_not_frozen(self):
+        vtype = VList(of=VInt())
+        Validator(mylist=vtype)
+        for copied in (copy(vtype), deepcopy(vtype)):
+            copied.required = False
+            self.assertFalse(copied.required)
+        deepcopy(vtype).of.required = False
+        with self.assertRaises(AttributeError):
+            vtype.required = False
+        self.assertTrue(vtype.of.required)
+
+    def test_pickle_and_deepcopy(self):
+        validator = Validator(
+            myint=VInt(),
+            mylist=VList(of=VDate()),
+            myvdict=VValidatorDict(validator=Validator(myenum=VEnum(enum=MyEnum))),
+        ).cached(maxsize=5).sampled(rate=0.5)
+        validator.to_types(dict(myint='1', mylist=[], myvdict=dict(myenum='Option 1')))
+        params = dict(myint='1', mylist=['2016-10-22'], myvdict=dict(myenum='Option 1'))
+        for copied in (pickle.loads(pickle.dumps(validator)), deepcopy(validator)):
+            self.assertEqual(copied.fingerprint(), validator.fingerprint())
+            self.assertEqual(copied.to_types(params), validator.to_types(params))
+            self.assertEqual(copied.cache_info().maxsize, 5)
+            self.assertEqual(copied.cache_info().currsize, 1)
+            self.assertEqual(copied.sample_info().checked + copied.sample_info().trusted, 1)
+            with self.assertRaises(AttributeError):
+                copied.vs['myint'].required = False
+
+    def test_add_remove_still_work(self):
+        validator = Validator(myint=VInt()).add(mystring=VString()).remove('myint')
+        self.assertEqual(list(validator.vs), ['mystring'])
+
+
+class ManyTestCase(TestCase):
+
+    validator = Validator(
+        myint=VInt(),
+        mydatetime=VDateTime(),
+        mylist=VList(of=VUnsignedInt()),
+    )
+
+    def _params(self, count):
+        return [
+            dict(myint=str(i), mydatetime='2016-10-22T10:30:{:02d}'.format(i % 60),
+                 mylist=[str(i % 7), str(i % 3)])
+            for i in range(count)]
+
+    def test_serial(self):
+        params = self._params(10)
+        self.assertEqual(self.validator.to_types_many(params),
+                         [self.validator.to_types(p) for p in params])
+
+    def test_threads_match_serial(self):
+        params = self._params(2000)
+        expected = [self.validator.to_types(p) for p in params]
+        for workers in (1, 3, 8):
+            self.assertEqual(
+                self.validator.to_types_many(params, executor='threads', workers=workers),
+                expected)
+
+    def test_threads_cached_under_contention(self):
+        validator = self.validator.cached(maxsize=16)
+        params = self._params(50) * 40
+        expected = [self.validator.to_types(p) for p in params]
+        for _ in range(5):
+            self.assertEqual(validator.to_types_many(params, executor='threads', workers=8), expected)
+        info = validator.cache_info()
+        self.assertEqual(info.hits + info.misses, len(params) * 5)
+        self.assertLessEqual(info.currsize, 16)
+
+    def test_to_strings_many(self):
+        records = self.validator.to_types_many(self._params(5))
+        records = [dict(myint=r['myint'], mydatetime=r['mydatetime']) for r in records]
+        validator = self.validator.remove('mylist')
+        self.assertEqual(validator.to_strings_many(records, executor='threads', workers=2),
+                         [validator.to_strings(r) for r in records])
+
+    def test_errors_propagate(self):
+        params = self._params(10) + [dict(myint='bad', mydatetime='', mylist=[])]
+        with self.assertRaises(ValueError):
+            self.validator.to_types_many(params, executor='threads', workers=4)
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            self.validator.to_types_many([], executor='processes')
+
+
+class SampledValidatorTestCase(TestCase):
+
+    validator = Validator(
+        myint=VUnsignedInt(),
+        mydate=VDate(required=False),
+        mylist=VList(of=VInt()),
+    )
+
+    def test_trusted_converts(self):
+        validator = self.validator.sampled(rate=0)
+        self.assertEqual(validator.to_types(dict(myint='1', mydate='2016-10-22', mylist=['2'])),
+                         dict(myint=1, mydate=date(2016, 10, 22), mylist=[2]))
+        self.assertEqual(validator.to_types(dict(myint=1, mydate='', mylist=[])),
+                         dict(myint=1, mydate=None, mylist=[]))
+        self.assertEqual(validator.sample_info(), (0, 2, 0))
+
+    def test_trusted_skips_checks(self):
+        validator = self.validator.sampled(rate=0)
+        self.assertEqual(validator.to_types(dict(myint='-1', mylist=[])),
+                         dict(myint=-1, mydate=None, mylist=[]))
+
+    def test_trusted_still_fails_unconvertible(self):
+        validator = self.validator.sampled(rate=0)
+        with self.assertRaises(ValueError):
+            validator.to_types(dict(myint='one', mylist=[]))
+        with self.assertRaises(ValueError):
+            validator.to_types(dict(myint='1', mylist=[], other='1'))
+
+    def test_drift_is_reported(self):
+        drifts = []
+        validator = self.validator.sampled(rate=1, on_drift=lambda params, exc: drifts.append(params))
+        self.assertEqual(validator.to_types(dict(myint='-1', mylist=[])),
+                         dict(myint=-1, mydate=None, mylist=[]))
+        self.assertEqual(validator.to_types(dict(myint='1', mylist=[])),
+                         dict(myint=1, mydate=None, mylist=[]))
+        self.assertEqual(drifts, [dict(myint='-1', mylist=[])])
+        self.assertEqual(validator.sample_info(), (2, 0, 1))
+
+    def test_drift_reported_then_raised(self):
+        drifts = []
+        validator = self.validator.sampled(rate=1, on_drift=lambda params, exc: drifts.append(params))
+        with self.assertRaises(ValueError):
+            validator.to_types(dict(myint='x', mylist=[]))
+        self.assertEqual(drifts, [dict(myint='x', mylist=[])])
+        self.assertEqual(validator.sample_info(), (1, 0, 1))
+
+    def test_rate(self):
+        validator = self.validator.sampled(rate=0.25, seed=1)
+        for i in range(1000):
+            validator.to_types(dict(myint=str(i), mylist=[]))
+        info = validator.sample_info()
+        self.assertEqual(info.checked + info.trusted, 1000)
+        self.assertTrue(200 < info.checked < 300)
+
+    def test_bad_rate(self):
+        with self.assertRaises(ValueError):
+            self.validator.sampled(rate=2)
+
+    def test_nested_validator_trusted(self):
+        validator = Validator(
+            myvdict=VValidatorDict(validator=Validator(myint=VUnsignedInt())),
+        ).sampled(rate=0)
+        self.assertEqual(validator.to_types(dict(myvdict=dict(myint='-1'))),
+                         dict(myvdict=dict(myint=-1)))
+
+    def test_sampled_and_cached(self):
+        validator = self.validator.cached().sampled(rate=0).remove('mydate')
+        validator.to_types(dict(myint='1', mylist=[]))
+        validator.to_types(dict(myint='1', mylist=[]))
+        self.assertEqual(validator.cache_info().hits, 1)
+        self.assertEqual(validator.sample_info().trusted, 1)
+
+
+class IntoTestCase(TestCase):
+
+    validator = Validator(
+        myint=VInt(),
+        mystring=VString(required=False),
+    )
+
+    def test_to_types_into(self):
+        out = dict(stale=1)
+        result = self.validator.to_types_into(dict(myint='1'), out)
+        self.assertIs(result, out)
+        self.assertEqual(out, dict(myint=1, mystring=None))
+        self.validator.to_types_into(dict(myint='2', mystring='a'), out)
+        self.assertEqual(out, dict(myint=2, mystring='a'))
+
+    def test_to_strings_into(self):
+        out = {}
+        self.assertIs(self.validator.to_strings_into(dict(myint=1, mystring='a'), out), out)
+        self.assertEqual(out, dict(myint='1', mystring='a'))
+
+    def test_unexpected_arguments(self):
+        with self.assertRaisesRegex(ValueError, 'Unexpected arguments: {\'other\'}'):
+            self.validator.to_types_into(dict(myint='1', other='a'), {})
+
+    def test_cached(self):
+        validator = self.validator.cached()
+        for _ in range(2):
+            out = {}
+            validator.to_types_into(dict(myint='1'), out)
+            self.assertEqual(out, dict(myint=1, mystring=None))
+        self.assertEqual(validator.cache_info().hits, 1)
+
+    def test_sampled(self):
+        validator = Validator(myint=VUnsignedInt()).sampled(rate=1)
+        out = {}
+        validator.to_types_into(dict(myint='-1'), out)
+        self.assertEqual(out, dict(myint=-1))
+        self.assertEqual(validator.sample_info().drifted, 1)
+
+
+def fingerprint_check(value):
+    return value
+
+
+def _make_check(limit):
+    def check(value):
+        return value < limit
+    return check
+
+
+# A closure with a module-level name, so only __closure__ gives it away.
+fingerprint_closure = _make_check(1)
+fingerprint_closure.__qualname__ = 'fingerprint_closure'
+
+
+class VCheckedInt(VInt):
+    extra_init_kwargs = ['check']
+
+
+class FingerprintTestCase(TestCase):
+
+    def _validator(self, **overrides):
+        vs = dict(
+            myint=VInt(),
+            mydate=VDate(required=False, default='2016-10-22'),
+            mylist=VList(of=VDateTime()),
+            myvdict=VValidatorDict(validator=Validator(mystring=VString())),
+            myenum=VEnum(enum=MyEnum),
+        )
+        vs.update(overrides)
+        return Validator(**vs)
+
+    def test_equal_validators(self):
+        self.assertEqual(self._validator().fingerprint(), self._validator().fingerprint())
+
+    def test_key_order_ignored(self):
+        self.assertEqual(Validator(a=VInt(), b=VString()).fingerprint(),
+                         Validator(b=VString(), a=VInt()).fingerprint())
+
+    def test_settings_ignored(self):
+        validator = self._validator()
+        self.assertEqual(validator.cached().sampled().fingerprint(), validator.fingerprint())
+
+    def test_changes(self):
+        fingerprint = self._validator().fingerprint()
+        changed = [
+            self._validator().remove('myint'),
+            self._validator().add(other=VInt()),
+            self._validator(myint=VUnsignedInt()),
+            self._validator(myint=VInt(required=False)),
+            self._validator(myint=VInt(default='1')),
+            self._validator(myint=VInt(settable=False, default='1')),
+            self._validator(mylist=VList(of=VDate())),
+            self._validator(myvdict=VValidatorDict(validator=Validator(mystring=VInt()))),
+            self._validator(myenum=VEnum(enum=MyNonStringEnum)),
+        ]
+        fingerprints = [validator.fingerprint() for validator in changed]
+        self.assertNotIn(fingerprint, fingerprints)
+        self.assertEqual(len(set(fingerprints)), len(fingerprints))
+
+    def test_function_described_by_name(self):
+        self.assertEqual(
+            Validator(myint=VCheckedInt(check=fingerprint_check)).fingerprint(),
+            Validator(myint=VCheckedInt(check=fingerprint_check)).fingerprint())
+        self.assertNotEqual(
+            Validator(myint=VCheckedInt(check=fingerprint_check)).fingerprint(),
+            Validator(myint=VCheckedInt(check=abs)).fingerprint())
+
+    def test_lambda_refused(self):
+        with self.assertRaises(TypeError):
+            Validator(myint=VCheckedInt(check=lambda v: v > 0)).fingerprint()
+
+    def test_closure_refused(self):
+        def make(limit):
+            def check(value):
+                return value < limit
+            return check
+        with self.assertRaises(TypeError):
+            Validator(myint=VCheckedInt(check=make(1))).fingerprint()
+        with self.assertRaises(TypeError):
+            Validator(myint=VCheckedInt(check=fingerprint_closure)).fingerprint()
+
+    def test_unstable_value_refused(self):
+        with self.assertRaises(TypeError):
+            Validator(myint=VCheckedInt(check=object())).fingerprint()
+
+    def test_stable_between_processes(self):
+        code = (
+            'from vtypes import Validator, VInt, VList, VDate; '
+            'print(Validator(a=VInt(), b=VList(of=VDate(required=False)), '
+            'c=VInt(required=False, default=abs)).fingerprint())')
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(__file__) or '.')
+        validator = Validator(a=VInt(), b=VList(of=VDate(required=False)),
+                              c=VInt(required=False, default=abs))
+        self.assertEqual(output.decode().strip(), validator.fingerprint())
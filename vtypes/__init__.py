@@ -1,34 +1,348 @@
-from datetime import date, datetime, time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta, timezone
 from enum import Enum
+from functools import lru_cache
+from hashlib import sha256
+from os import cpu_count
+from random import Random
+from threading import Lock
+from time import monotonic
+from types import BuiltinFunctionType, FunctionType, MappingProxyType
+
+
+__version__ = '0.0.1'
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+SampleInfo = namedtuple('SampleInfo', ['checked', 'trusted', 'drifted'])
+
+_missing = object()
+
+
+def _cache_key(value):
+    # Build a hashable, canonical key for an input record. Dict keys
+    # are sorted so that insertion order doesn't matter, and the type
+    # of each value is included so that eg 1 and True don't collide.
+    # Leaves are keyed so that values which compare equal but differ,
+    # eg -0.0 and 0.0, or datetimes with different UTC offsets, don't
+    # collide. Other values raise TypeError, so the record isn't
+    # cached.
+    type_ = type(value)
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda item: item[0])
+        return (type_, tuple((k, _cache_key(v)) for k, v in items))
+    if isinstance(value, (list, tuple)):
+        return (type_, tuple(_cache_key(v) for v in value))
+    if type_ in (str, int, bool, type(None)):
+        return (type_, value)
+    if type_ in (float, Decimal):
+        return (type_, repr(value))
+    if type_ in (datetime, time):
+        return (type_, value.isoformat(), value.fold, value.tzinfo)
+    if type_ is date:
+        return (type_, value.isoformat())
+    if isinstance(value, Enum):
+        return (type_, value.name)
+    raise TypeError('Unable to build cache key for {!r}'.format(value))
+
+
+def _copy_record(value):
+    # Like deepcopy, but read-only mappings, eg records from a nested
+    # validator cached with immutable=True, are copied to dicts, as
+    # they can't be deep copied.
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: _copy_record(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_record(v) for v in value]
+    return deepcopy(value)
+
+
+class _RecordCache(object):
+
+    def __init__(self, maxsize, ttl, immutable, mutable_fields, clock=monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.immutable = immutable
+        self.mutable_fields = mutable_fields
+        self.clock = clock
+        self.records = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Coercion and copying happen outside of the lock, so two
+        # threads missing on the same record may both coerce it, but
+        # only the bookkeeping needs to be serialised. Stored records
+        # are never changed, so can be copied without the lock.
+        self.lock = Lock()
+
+    def _output(self, record):
+        if self.immutable:
+            return MappingProxyType(record)
+        if self.mutable_fields:
+            return _copy_record(record)
+        return dict(record)
+
+    def lookup(self, params, coerce):
+        try:
+            key = _cache_key(params)
+        except TypeError:
+            # Unsupported or unorderable input, so just don't cache it.
+            return self._output(coerce(params))
+
+        now = self.clock()
+        record = None
+        with self.lock:
+            entry = self.records.get(key)
+            if entry is not None:
+                expires, cached = entry
+                if expires is None or now < expires:
+                    self.records.move_to_end(key)
+                    self.hits += 1
+                    record = cached
+                else:
+                    del self.records[key]
+            if record is None:
+                self.misses += 1
+        if record is not None:
+            return self._output(record)
+
+        record = coerce(params)
+        expires = None if self.ttl is None else now + self.ttl
+        with self.lock:
+            self.records[key] = (expires, record)
+            if self.maxsize is not None:
+                while len(self.records) > self.maxsize:
+                    self.records.popitem(last=False)
+        return self._output(record)
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.records))
+
+
+class _Sampler(object):
+
+    def __init__(self, rate, on_drift, seed):
+        self.rate = rate
+        self.on_drift = on_drift
+        self.random = Random(seed)
+        self.checked = 0
+        self.trusted = 0
+        self.drifted = 0
+        self.lock = Lock()
+
+    def should_check(self):
+        with self.lock:
+            check = self.random.random() < self.rate
+            if check:
+                self.checked += 1
+            else:
+                self.trusted += 1
+        return check
+
+    def drift(self, params, exc):
+        with self.lock:
+            self.drifted += 1
+        if self.on_drift is not None:
+            self.on_drift(params, exc)
+
+    def info(self):
+        with self.lock:
+            return SampleInfo(self.checked, self.trusted, self.drifted)
+
+
+# Types whose repr is the same in every process.
+_stable_repr_types = (type(None), bool, int, float, complex, str, bytes, date, time, timedelta, timezone)
+
+
+def _describe(value):
+    # Describe a VType setting in a form whose repr is stable between
+    # processes, for Validator.fingerprint.
+    if isinstance(value, (Validator, VType)):
+        return value._describe()
+    if isinstance(value, type):
+        desc = '{}.{}'.format(value.__module__, value.__qualname__)
+        if issubclass(value, Enum):
+            return (desc, tuple((member.name, _describe(member.value)) for member in value))
+        return desc
+    if isinstance(value, Enum):
+        return (_describe(type(value)), value.name)
+    if isinstance(value, (FunctionType, BuiltinFunctionType)):
+        # Lambdas and closures can't be told apart by name.
+        name = value.__qualname__
+        if '<lambda>' in name or '<locals>' in name or getattr(value, '__closure__', None):
+            raise TypeError('Unable to fingerprint {!r}'.format(value))
+        return '{}.{}'.format(value.__module__, name)
+    if isinstance(value, (list, tuple)):
+        return (_describe(type(value)), tuple(_describe(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return (_describe(type(value)), tuple(sorted(repr(_describe(v)) for v in value)))
+    if isinstance(value, dict):
+        items = sorted((repr(_describe(k)), _describe(v)) for k, v in value.items())
+        return (_describe(type(value)), tuple(items))
+    if isinstance(value, _stable_repr_types):
+        return repr(value)
+    raise TypeError('Unable to fingerprint {!r}'.format(value))
+
+
+def _chunks(items, count):
+    size, extra = divmod(len(items), count)
+    start = 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        yield items[start:end]
+        start = end
+
+
+def _rebuild_validator(cls, vs, cache_kwargs, sample_kwargs):
+    new = cls(**vs)
+    if cache_kwargs is not None or sample_kwargs is not None:
+        new = new._copy(vs, cache_kwargs=cache_kwargs, sample_kwargs=sample_kwargs)
+    return new
 
 
 class Validator(object):
+    # Validators, and the VTypes in them, can't be changed once the
+    # Validator is constructed, so may be shared between threads. Use
+    # add and remove to get modified copies. Note that this means
+    # subclasses can't set attributes after calling
+    # super().__init__(), and that the VTypes passed in are frozen
+    # themselves, not copied; use copy.copy to get a changeable copy
+    # of a VType.
+    _frozen = False
 
     def __init__(self, **vs):
-        self.vs = vs
+        for vtype in vs.values():
+            vtype._freeze()
+        self.vs = MappingProxyType(vs)
+        self._cache = None
+        self._cache_kwargs = None
+        self._sampler = None
+        self._sample_kwargs = None
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError('{} is immutable.'.format(self.__class__.__name__))
+        super().__setattr__(name, value)
+
+    def __reduce__(self):
+        # Rebuild from the VTypes and settings when pickled or copied,
+        # as vs is a mappingproxy and the cache and sampler hold
+        # locks. The copy starts with an empty cache and zero counts.
+        return (_rebuild_validator, (
+            self.__class__, dict(self.vs), self._cache_kwargs, self._sample_kwargs))
+
+    def _copy(self, vs, cache_kwargs=None, sample_kwargs=None):
+        # Copy with the given VTypes, keeping the cache and sampling
+        # settings unless overridden. The cached records and sample
+        # counts themselves are not copied.
+        new = self.__class__(**vs)
+
+        cache_kwargs = cache_kwargs or self._cache_kwargs
+        if cache_kwargs is not None:
+            mutable_fields = sorted(k for k, v in vs.items() if v.mutable_output)
+            if cache_kwargs['immutable'] and mutable_fields:
+                raise ValueError(
+                    'Cannot cache immutable records with mutable fields: {}'.format(
+                        ', '.join(mutable_fields)))
+            cache = _RecordCache(mutable_fields=bool(mutable_fields), **cache_kwargs)
+            object.__setattr__(new, '_cache_kwargs', cache_kwargs)
+            object.__setattr__(new, '_cache', cache)
+
+        sample_kwargs = sample_kwargs or self._sample_kwargs
+        if sample_kwargs is not None:
+            object.__setattr__(new, '_sample_kwargs', sample_kwargs)
+            object.__setattr__(new, '_sampler', _Sampler(**sample_kwargs))
+        return new
 
     def add(self, **vs):
         all_vs = self.vs.copy()
         for k, v in vs.items():
             all_vs[k] = v
-        return self.__class__(**all_vs)
+        return self._copy(all_vs)
 
     def remove(self, *keys):
         all_vs = self.vs.copy()
         for k in keys:
             all_vs.pop(k)
-        return self.__class__(**all_vs)
-
-    def _coerce(self, params, to_types=False):
-        coerced = {}
-        all_keys = set(params.keys())
+        return self._copy(all_vs)
+
+    def cached(self, maxsize=128, ttl=None, immutable=False):
+        # Return a copy of this validator that memoizes to_types.
+        # Records are keyed on their contents, and evicted least
+        # recently used first once there are more than maxsize of them,
+        # or once they are older than ttl seconds. Callers never get
+        # the cached record itself: by default they get a copy (a deep
+        # copy if any field is a VDict or VList, as those values are
+        # mutable, in which read-only mappings from nested immutable
+        # cached validators become dicts), or with immutable=True a
+        # read-only mapping. immutable=True is refused for validators
+        # with VDict or VList fields, as their values could still be
+        # changed through the read-only mapping.
+        cache_kwargs = dict(maxsize=maxsize, ttl=ttl, immutable=immutable)
+        return self._copy(self.vs, cache_kwargs=cache_kwargs)
+
+    def _describe(self):
+        return tuple(sorted((key, vtype._describe()) for key, vtype in self.vs.items()))
+
+    def fingerprint(self):
+        # A hash of the structure of the validator: its keys, and the
+        # class and settings of each VType, including nested VTypes
+        # and Validators. Equal validators built in different
+        # processes have equal fingerprints, and changing the schema
+        # changes the fingerprint. Cache and sampling settings are
+        # not included. Raises TypeError if a setting has no stable
+        # description, eg an object whose repr is its address.
+        return sha256(repr(self._describe()).encode('utf-8')).hexdigest()
+
+    def cache_info(self):
+        if self._cache is None:
+            raise ValueError('Validator is not cached.')
+        return self._cache.info()
+
+    def sampled(self, rate=0.01, on_drift=None, seed=None):
+        # Return a copy of this validator that only fully validates a
+        # fraction of the records passed to to_types. This is for
+        # records that are trusted to be valid already, eg those
+        # produced by to_strings in another service. Each record is
+        # fully validated with probability rate. The rest are only
+        # converted, skipping the type checks and check_typed_value.
+        # If a fully validated record fails, on_drift(params, exc) is
+        # called and the record is converted as if trusted, rather
+        # than raising. Records that can't be converted at all, eg 'x'
+        # for a VInt, still raise ValueError after being reported.
+        # sample_info gives counts of checked, trusted and drifted
+        # records.
+        if not 0 <= rate <= 1:
+            raise ValueError('Sample rate must be between 0 and 1.')
+        sample_kwargs = dict(rate=rate, on_drift=on_drift, seed=seed)
+        return self._copy(self.vs, sample_kwargs=sample_kwargs)
+
+    def sample_info(self):
+        if self._sampler is None:
+            raise ValueError('Validator is not sampled.')
+        return self._sampler.info()
+
+    def _coerce(self, params, to_types=False, trusted=False, out=None):
+        coerced = {} if out is None else out
+        # Count the keys found rather than building a set of the
+        # unexpected ones, which is only needed for the error message.
+        found = 0
 
         for key, vtype in self.vs.items():
-            param = params.get(key, vtype.default)
+            param = params.get(key, _missing)
+            if param is _missing:
+                param = vtype.default
+            else:
+                found += 1
             if vtype.required and (param is None):
                 raise ValueError('Missing required value for {}'.format(key))
             try:
-                if to_types:
+                if trusted:
+                    value = vtype.coerce_to_type_trusted(param)
+                elif to_types:
                     value = vtype.coerce_to_type(param)
                 else:
                     value = vtype.coerce_to_string(param)
@@ -36,17 +350,67 @@ class Validator(object):
                 raise ValueError('Unable to load value for {!r}: {!r}'.format(key, param)) from exc
                 
             coerced[key] = value
-            all_keys.discard(key)
-        if all_keys:
+        if found != len(params):
+            all_keys = set(params.keys()) - set(self.vs.keys())
             raise ValueError('Unexpected arguments: {}'.format(all_keys))
         return coerced
 
+    def _to_types(self, params, out=None):
+        if self._sampler is None:
+            return self._coerce(params, to_types=True, out=out)
+        if self._sampler.should_check():
+            try:
+                return self._coerce(params, to_types=True, out=out)
+            except ValueError as exc:
+                self._sampler.drift(params, exc)
+        return self._coerce(params, to_types=True, trusted=True, out=out)
+
     def to_types(self, params):
-        return self._coerce(params, to_types=True)
+        if self._cache is not None:
+            return self._cache.lookup(params, self._to_types)
+        return self._to_types(params)
 
     def to_strings(self, params):
         return self._coerce(params, to_types=False)
 
+    # The _into methods clear and fill out, a mapping owned by the
+    # caller, rather than allocating a new dict for each record. If
+    # coercion fails, out is left partially filled. Cached validators
+    # still allocate a copy of the cached record, which is then copied
+    # into out, so gain nothing from this.
+
+    def to_types_into(self, params, out):
+        out.clear()
+        if self._cache is not None:
+            out.update(self.to_types(params))
+            return out
+        return self._to_types(params, out=out)
+
+    def to_strings_into(self, params, out):
+        out.clear()
+        return self._coerce(params, to_types=False, out=out)
+
+    def _coerce_many(self, method, params_list, executor, workers):
+        params_list = list(params_list)
+        if executor is None:
+            return [method(params) for params in params_list]
+        if executor != 'threads':
+            raise ValueError('Unknown executor {!r}'.format(executor))
+
+        # Give each thread one contiguous chunk, rather than a future
+        # per record, and put the results back together in order.
+        workers = workers or cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunks = _chunks(params_list, workers)
+            results = pool.map(lambda chunk: [method(params) for params in chunk], chunks)
+            return [record for chunk in results for record in chunk]
+
+    def to_types_many(self, params_list, executor=None, workers=None):
+        return self._coerce_many(self.to_types, params_list, executor, workers)
+
+    def to_strings_many(self, params_list, executor=None, workers=None):
+        return self._coerce_many(self.to_strings, params_list, executor, workers)
+
 
 class VType(object):
     type = None
@@ -54,6 +418,10 @@ class VType(object):
     default = None
     settable = True
     extra_init_kwargs = ()
+    # Whether coerced values can be changed in place, eg dicts and lists.
+    mutable_output = False
+    # Set once added to a Validator, after which the VType is immutable.
+    _frozen = False
 
     def __init__(self, required=True, default=None, settable=True, **kwargs):
         self.required = required
@@ -71,6 +439,46 @@ class VType(object):
                 raise TypeError('Unexpected kwarg {}'.format(key))
             setattr(self, key, value)
 
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError('{} is immutable once added to a Validator.'.format(self.clsname))
+        super().__setattr__(name, value)
+
+    def __copy__(self):
+        # Copies are not frozen, so may be changed and added to
+        # another Validator.
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.__dict__.pop('_frozen', None)
+        return new
+
+    def __deepcopy__(self, memo):
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        for key, value in self.__dict__.items():
+            if key != '_frozen':
+                new.__dict__[key] = deepcopy(value, memo)
+        return new
+
+    def _freeze(self):
+        for key in self.extra_init_kwargs:
+            value = getattr(self, key, None)
+            if isinstance(value, VType):
+                value._freeze()
+        object.__setattr__(self, '_frozen', True)
+
+    def _describe(self):
+        extra = tuple(
+            (key, _describe(getattr(self, key, None)))
+            for key in self.extra_init_kwargs)
+        return (
+            _describe(self.__class__),
+            self.required,
+            _describe(self.default),
+            self.settable,
+            extra,
+        )
+
     @property
     def clsname(self):
         return self.__class__.__name__
@@ -89,6 +497,15 @@ class VType(object):
             str_value = value
         return self._coerce_string_to_type(str_value)
 
+    def coerce_to_type_trusted(self, value):
+        # Convert a value that is trusted to be valid, so skip the
+        # checks in _coerce_string_to_type.
+        if type(value) is not str:
+            return value
+        if not self.required and not value:
+            return None
+        return self.coerce_string_to_type(value)
+
     def _check_type(self, value, type_):
         if not self.required and (value is None):
             return
@@ -176,6 +593,7 @@ class VNonStringableMixin(object):
 
 class VDict(VNonStringableMixin, VType):
     type = dict
+    mutable_output = True
 
 
 class VValidatorDict(VDict):
@@ -187,16 +605,27 @@ class VValidatorDict(VDict):
             raise AttributeError('Missing validator for {}'.format(self.clsname))
         return self.validator.to_types(value)
 
+    def coerce_to_type_trusted(self, value):
+        if not self.validator:
+            raise AttributeError('Missing validator for {}'.format(self.clsname))
+        return self.validator._coerce(value, to_types=True, trusted=True)
+
 
 class VList(VNonStringableMixin, VType):
     type = list
+    mutable_output = True
     extra_init_kwargs = ['of']
 
     def coerce_to_type(self, value):
         value = super().coerce_to_type(value)
         if not self.of:
             return value
-        return self.type(self.of.coerce_to_type(item) for item in value)
+        return [self.of.coerce_to_type(item) for item in value]
+
+    def coerce_to_type_trusted(self, value):
+        if not self.of:
+            return value
+        return [self.of.coerce_to_type_trusted(item) for item in value]
 
 
 class VDTBase(VType):
@@ -231,6 +660,34 @@ class VDate(VDTBase):
     type = date
 
 
+@lru_cache(maxsize=None)
+def _fixed_offset(minutes):
+    # Share one tzinfo per offset, rather than one per parsed value.
+    if minutes == 0:
+        return timezone.utc
+    return timezone(timedelta(minutes=minutes))
+
+
+def _split_offset(value):
+    # Split a trailing 'Z', '+HH:MM' or '+HHMM' UTC offset from value.
+    if value.endswith('Z'):
+        return value[:-1], timezone.utc
+    if len(value) > 6 and value[-6] in '+-' and value[-3] == ':':
+        sign, hours, minutes = value[-6], value[-5:-3], value[-2:]
+        naive = value[:-6]
+    elif len(value) > 5 and value[-5] in '+-':
+        sign, hours, minutes = value[-5], value[-4:-2], value[-2:]
+        naive = value[:-5]
+    else:
+        raise ValueError('Missing UTC offset in {!r}'.format(value))
+    if not (hours.isdigit() and minutes.isdigit()) or int(hours) > 23 or int(minutes) > 59:
+        raise ValueError('Invalid UTC offset in {!r}'.format(value))
+    offset = int(hours) * 60 + int(minutes)
+    if sign == '-':
+        offset = -offset
+    return naive, _fixed_offset(offset)
+
+
 class VDateTime(VDTBase):
     allowed_formats = [
         '%Y-%m-%dT%H:%M:%S.%fZ',
@@ -239,6 +696,45 @@ class VDateTime(VDTBase):
         '%Y-%m-%dT%H:%M:%S',
     ]
     type = datetime
+    # With tz_aware, values must have a UTC offset, and are returned as
+    # aware datetimes. With to_utc as well, they are converted to UTC
+    # when coerced to strings.
+    extra_init_kwargs = ['tz_aware', 'to_utc']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.to_utc and not self.tz_aware:
+            raise ValueError('Must set tz_aware to use to_utc for {}'.format(self.clsname))
+
+    def check_typed_value(self, value):
+        if self.tz_aware and value.tzinfo is None:
+            raise ValueError('Value for {} must be timezone aware'.format(self.clsname))
+
+    def coerce_type_to_string(self, value):
+        if self.tz_aware and self.to_utc:
+            value = value.astimezone(timezone.utc)
+        return super().coerce_type_to_string(value)
+
+    def coerce_string_to_type(self, value):
+        if not self.tz_aware:
+            return super().coerce_string_to_type(value)
+        naive, tzinfo = _split_offset(value)
+        # fromisoformat is much faster than strptime, but accepts more
+        # formats, so only use it for strings of exactly the allowed
+        # shape, falling back to strptime for anything else.
+        if (len(naive) == 19 or (21 <= len(naive) <= 26 and naive[19] == '.')) \
+                and naive[4] == naive[7] == '-' and naive[10] == 'T' \
+                and naive[13] == naive[16] == ':':
+            try:
+                return datetime.fromisoformat(naive).replace(tzinfo=tzinfo)
+            except ValueError:
+                pass
+        # Pick the format up front, rather than trying each in turn.
+        if '.' in naive:
+            format = '%Y-%m-%dT%H:%M:%S.%f'
+        else:
+            format = '%Y-%m-%dT%H:%M:%S'
+        return datetime.strptime(naive, format).replace(tzinfo=tzinfo)
 
 
 class VTime(VDTBase):
@@ -250,6 +746,8 @@ class VTime(VDTBase):
 
 
 class VEnum(VType):
+    extra_init_kwargs = ['enum']
+
     def __init__(self, *args, **kwargs):
         enum = kwargs.get('enum')
         if enum is None:
@@ -0,0 +1,88 @@
+import csv
+import mmap
+from itertools import islice
+
+
+def _iter_lines(mm, encoding):
+    for line in iter(mm.readline, b''):
+        yield line.decode(encoding)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _read_records(path, validator, columns, rename, encoding, fmtparams):
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Can't map an empty file, and there's nothing to read anyway.
+            return
+        with mm:
+            reader = csv.reader(_iter_lines(mm, encoding), **fmtparams)
+            try:
+                header = next(reader)
+            except StopIteration:
+                return
+            keys = [rename.get(name, name) for name in header]
+
+            if columns is None:
+                projection = list(enumerate(keys))
+                projected = validator
+            else:
+                columns = set(columns)
+                missing = columns - set(keys)
+                if missing:
+                    raise ValueError('Columns not in header: {}'.format(missing))
+                projection = [(i, key) for i, key in enumerate(keys) if key in columns]
+                projected = validator.remove(*(key for key in validator.vs if key not in columns))
+
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) != len(keys):
+                    raise ValueError('Expected {} fields on line {}, found {}'.format(
+                        len(keys), reader.line_num, len(row)))
+                params = {key: row[i] for i, key in projection}
+                yield projected.to_types(params)
+
+
+def read_csv(path, validator, columns=None, batch_size=None, rename=None,
+             encoding='utf-8', **fmtparams):
+    # Lazily read the file at path, memory-mapped, coercing each row
+    # with the validator. The header row gives the key for each
+    # column, optionally renamed with rename. If columns is given,
+    # only those keys are coerced and returned. If batch_size is
+    # given, yield lists of up to that many records rather than
+    # single records. Extra kwargs are passed on to csv.reader, eg
+    # delimiter='\t' for TSV files.
+    records = _read_records(path, validator, columns, rename or {}, encoding, fmtparams)
+    if batch_size is None:
+        return records
+    return _batches(records, batch_size)
+
+
+def write_csv(path, validator, records, batch_size=1000, encoding='utf-8',
+              buffering=1024 * 1024, **fmtparams):
+    # Write records to path, coercing each one with the validator's
+    # to_strings, batch_size rows at a time. Returns the number of
+    # records written.
+    keys = list(validator.vs)
+    count = 0
+    with open(path, 'w', newline='', encoding=encoding, buffering=buffering) as f:
+        writer = csv.writer(f, **fmtparams)
+        writer.writerow(keys)
+        for batch in _batches(records, batch_size):
+            rows = []
+            for record in batch:
+                strings = validator.to_strings(record)
+                rows.append([strings[key] for key in keys])
+            writer.writerows(rows)
+            count += len(rows)
+    return count